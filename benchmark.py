@@ -0,0 +1,921 @@
+#!/usr/bin/env python3
+"""Benchmark Mini FFUF với server HTTP giả lập chạy local"""
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from miniFFUF import MiniFFUF, ResponseFilter, ENGINES, aiohttp, h2
+
+
+class ServerThrottle:
+    """Token bucket phía server giả lập: vượt capacity req/s thì trả 429 (kèm Retry-After nếu bật)"""
+
+    def __init__(self, capacity, retry_after):
+        self.capacity = capacity
+        self.burst = max(1.0, capacity / 10)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.retry_after = retry_after
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.capacity)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+# Từ hit do write_wordlist tạo ra (admin + số), không khớp probe admin<chuỗi ngẫu nhiên> của -ac
+HIT_PATTERN = re.compile(rb'admin\d+(?=[/?&.\s]|$)')
+
+
+def sample_latency(options):
+    """Độ trễ một request theo phân phối latency_dist, trung bình bằng latency giây"""
+    mean = options['latency']
+    distribution = options.get('latency_dist', 'fixed')
+    if not mean or distribution == 'fixed':
+        return mean
+    if distribution == 'uniform':
+        return random.uniform(0, 2 * mean)
+    if distribution == 'exponential':
+        return random.expovariate(1 / mean)
+    # Lognormal sigma=1: đuôi dài như server thật, mu chọn để trung bình vẫn bằng mean
+    return random.lognormvariate(math.log(mean) - 0.5, 1)
+
+
+async def simulate_latency(options):
+    """Độ trễ xử lý mỗi request: cứ outlier_every request có một request chậm outlier_latency giây"""
+    options['count'] = options.get('count', 0) + 1
+    if options.get('outlier_every') and options['count'] % options['outlier_every'] == 0:
+        await asyncio.sleep(options['outlier_latency'])
+    elif options['latency']:
+        await asyncio.sleep(sample_latency(options))
+
+
+def inject_fault(options):
+    """Lỗi ngẫu nhiên thay cho response bình thường: 'reset' (đóng connection), 'error' (500), 'throttle' (429)"""
+    roll = random.random()
+    for fault in ('reset', 'error', 'throttle'):
+        rate = options.get(f'{fault}_rate', 0)
+        if roll < rate:
+            return fault
+        roll -= rate
+    return None
+
+
+def response_body(options, request_line, hit):
+    """Body của response: trang thật khi hit, còn lại là trang 404 (hoặc soft-404 phản chiếu path khi wildcard)"""
+    size = options['body_size']
+    if hit:
+        return b'A' * size
+    # Đệm bằng nhiều từ ngắn cho giống trang HTML thật
+    padding = b' lorem ipsum' * (size // 12)
+    if options.get('wildcard'):
+        # Size đổi theo độ dài path như trang soft-404 thật
+        path = request_line.split(b' ')[1] if b' ' in request_line else b'/'
+        return b'<html><title>Shop</title><body>Page ' + path + b' was not found</body></html>' + padding
+    return (b'<html><body>not found</body></html>' + padding + b' lorem ipsum')[:size]
+
+
+async def handle_client(reader, writer, options):
+    """Xử lý một kết nối keep-alive HTTP/1.1 của server giả lập"""
+    body = b'A' * options['body_size']
+    throttle = options.get('throttle')
+    served = 0  # Số response đã trả trên connection này (--close-every)
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, _, header_block = head.partition(b'\r\n')
+
+            # Đọc bỏ body của request (POST data) để giữ đúng framing keep-alive
+            content_length = 0
+            for line in header_block.split(b'\r\n'):
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length':
+                    content_length = int(value)
+            if content_length:
+                await reader.readexactly(content_length)
+
+            await simulate_latency(options)
+
+            fault = inject_fault(options)
+            if fault == 'reset':
+                writer.transport.abort()
+                return
+            if (throttle and not throttle.allow()) or fault == 'throttle':
+                retry_after = throttle.retry_after if throttle else options.get('retry_after', 0)
+                retry_after = b'Retry-After: %d\r\n' % retry_after if retry_after else b''
+                writer.write(b'HTTP/1.1 429 Too Many Requests\r\n' + retry_after + b'Content-Length: 0\r\n\r\n')
+                await writer.drain()
+                continue
+
+            # Client gửi Connection: close (--no-keepalive) thì báo lại và đóng như server thật
+            close = b'\r\nconnection: close' in head.lower()
+            # Server xoay vòng connection: đóng sau N response, bỏ các request pipeline chưa trả lời
+            served += 1
+            if options.get('close_every') and served % options['close_every'] == 0:
+                close = True
+            hit = HIT_PATTERN.search(request_line) is not None
+            if fault == 'error':
+                status = b'500 Internal Server Error'
+            elif hit or options.get('wildcard'):
+                status = b'200 OK'
+            else:
+                status = b'404 Not Found'
+            if options.get('pages'):
+                body = response_body(options, request_line, hit)
+            writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: text/html\r\n'
+                         + (b'Connection: close\r\n' if close else b'')
+                         + b'Content-Length: %d\r\n\r\n' % len(body) + body)
+            await writer.drain()
+            if close:
+                break
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def handle_h2_client(reader, writer, options):
+    """Xử lý một connection HTTP/2 (h2c prior knowledge) của server giả lập, mỗi stream trả lời trong task riêng"""
+    body = b'A' * options['body_size']
+    conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding=None))
+    conn.local_settings = h2.settings.Settings(client=False, initial_values={
+        h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: options.get('max_streams', 100)
+    })
+    conn.initiate_connection()
+    writer.write(conn.data_to_send())
+    paths = {}
+    tasks = {}
+    window_updated = asyncio.Event()
+
+    async def respond(stream_id, path):
+        await simulate_latency(options)
+        status = b'200' if HIT_PATTERN.search(path) else b'404'
+        conn.send_headers(stream_id, [(b':status', status), (b'content-type', b'text/html'),
+                                      (b'content-length', b'%d' % len(body))], end_stream=not body)
+        remaining = body
+        while remaining:
+            size = min(len(remaining), conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+            if size <= 0:
+                window_updated.clear()
+                writer.write(conn.data_to_send())
+                await window_updated.wait()
+                continue
+            conn.send_data(stream_id, remaining[:size], end_stream=size == len(remaining))
+            remaining = remaining[size:]
+        writer.write(conn.data_to_send())
+
+    def finished(stream_id, task):
+        tasks.pop(stream_id, None)
+        if not task.cancelled() and isinstance(task.exception(), h2.exceptions.StreamClosedError):
+            writer.write(conn.data_to_send())  # Client đã reset stream giữa chừng
+
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    paths[event.stream_id] = dict(event.headers).get(b':path', b'/')
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    task = asyncio.ensure_future(respond(event.stream_id, paths.pop(event.stream_id)))
+                    task.add_done_callback(functools.partial(finished, event.stream_id))
+                    tasks[event.stream_id] = task
+                elif isinstance(event, h2.events.StreamReset):
+                    paths.pop(event.stream_id, None)
+                    task = tasks.pop(event.stream_id, None)
+                    if task is not None:
+                        task.cancel()
+                elif isinstance(event, h2.events.WindowUpdated):
+                    window_updated.set()
+            writer.write(conn.data_to_send())
+    except (ConnectionError, h2.exceptions.ProtocolError):
+        pass
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        writer.close()
+
+
+def serve(options, ready):
+    """Chạy server giả lập trong process riêng, gửi port qua queue ready"""
+    async def main():
+        if options.get('capacity'):
+            options['throttle'] = ServerThrottle(options['capacity'], options.get('retry_after', 0))
+        handler = handle_h2_client if options.get('http2') else handle_client
+        server = await asyncio.start_server(
+            lambda reader, writer: handler(reader, writer, options),
+            '127.0.0.1', 0, backlog=4096
+        )
+        ready.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def start_server(ctx, options):
+    """Khởi động server giả lập, trả về (process, port)"""
+    ready = ctx.Queue()
+    process = ctx.Process(target=serve, args=(options, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=10)
+
+
+def write_wordlist(path, words, hit_every):
+    """Tạo wordlist với một 'admin' (trả 200) sau mỗi hit_every từ"""
+    with open(path, 'w') as f:
+        for i in range(words):
+            f.write(f"admin{i}\n" if hit_every and i % hit_every == 0 else f"w{i}\n")
+
+
+class BusyFuzzer(MiniFFUF):
+    """MiniFFUF ghi lại thời gian mỗi worker bận gửi request, để tính mức sử dụng worker"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.busy = []
+
+    def make_request(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().make_request(*args)
+        finally:
+            self.busy.append(time.perf_counter() - start)
+
+
+class LegacyBatchingFuzzer(BusyFuzzer):
+    """Cách cũ: ThreadPoolExecutor + list futures, khi đủ threads*2 thì chờ futures.pop(0) theo thứ tự"""
+
+    def run_threads(self, template, response_filter):
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = []
+            for index, replacements in self.generate_combinations(self.start_index):
+                self.begin_combination(index)
+                futures.append(executor.submit(self.worker, index, replacements, template, response_filter))
+                if len(futures) >= self.threads * 2:
+                    for _ in range(self.threads):
+                        futures.pop(0).result()
+            for future in futures:
+                future.result()
+        return 0
+
+
+def run_fuzzer(fuzzer_kwargs, run_kwargs, results, fuzzer_class='MiniFFUF'):
+    """Chạy MiniFFUF trong process riêng để đo RPS, CPU và bộ nhớ độc lập"""
+    sys.stdout = open(os.devnull, 'w')
+    fuzzer = globals()[fuzzer_class](**fuzzer_kwargs)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    fuzzer.run(**run_kwargs)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    stats = {
+        'requests': fuzzer.completed_requests,
+        'results': fuzzer.result_count,
+        'elapsed': elapsed,
+        'rps': fuzzer.completed_requests / elapsed if elapsed > 0 else 0,
+        'cpu_per_request_us': cpu / fuzzer.completed_requests * 1e6 if fuzzer.completed_requests else 0,
+        'connections': fuzzer.connection_stats.connections,
+        'failed': fuzzer.failed_count,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+    # Latency theo histogram của fuzzer (cận trên của bucket)
+    latencies = fuzzer.progress.percentiles(0.5, 0.9, 0.99)
+    if latencies:
+        stats.update({f'{name}_ms': value * 1000 for name, value in zip(('p50', 'p90', 'p99'), latencies)})
+    if isinstance(fuzzer, BusyFuzzer):
+        # Tỉ lệ thời gian worker thực sự có request đang chạy
+        stats['utilization'] = sum(fuzzer.busy) / (elapsed * fuzzer.threads) if elapsed > 0 else 0
+    results.put(stats)
+
+
+def measure(ctx, fuzzer_kwargs, run_kwargs, fuzzer_class='MiniFFUF'):
+    """Chạy một scenario trong process con và trả về số liệu"""
+    results = ctx.Queue()
+    process = ctx.Process(target=run_fuzzer, args=(fuzzer_kwargs, run_kwargs, results, fuzzer_class))
+    process.start()
+    stats = results.get()
+    process.join()
+    return stats
+
+
+def bench_engines(args, ctx):
+    """So sánh RPS và bộ nhớ giữa engine thread và engine async"""
+    options = {'latency': args.latency, 'body_size': args.body_size}
+    server, port = start_server(ctx, options)
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            wordlist = os.path.join(tmp, 'words.txt')
+            write_wordlist(wordlist, args.words, args.hit_every)
+
+            for concurrency in args.concurrency:
+                for engine in ENGINES:
+                    if engine == 'async' and aiohttp is None:
+                        print("[!] Bỏ qua engine async: chưa cài aiohttp", file=sys.stderr)
+                        continue
+                    fuzzer_kwargs = {
+                        'url': f'http://127.0.0.1:{port}/FUZZ',
+                        'wordlists': {'FUZZ': wordlist},
+                        'threads': concurrency,
+                        'timeout': 30,
+                        'engine': engine
+                    }
+                    stats = measure(ctx, fuzzer_kwargs, {'response_filter': ResponseFilter(filters={'codes': '404'})})
+                    stats.update({'engine': engine, 'concurrency': concurrency})
+                    rows.append(stats)
+                    if not args.json:
+                        print(f"[+] engine={engine:<6} concurrency={concurrency:<5} "
+                              f"requests={stats['requests']:<7} RPS={stats['rps']:<9.1f} "
+                              f"CPU/req={stats['cpu_per_request_us']:.0f}us "
+                              f"max RSS={stats['max_rss_mb']:.1f}MB")
+    finally:
+        server.terminate()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def bench_body(args, ctx):
+    """Đo RPS và bộ nhớ khi response lớn: bỏ qua body, stream đếm, giữ body và giữ tối đa --max-body"""
+    server, port = start_server(ctx, {'latency': 0, 'body_size': args.body_size})
+    scenarios = (
+        ('codes', {'filters': {'codes': '404'}}, None),
+        ('words', {'filters': {'words': '0'}}, None),
+        ('regex', {'filters': {'regex': ['^not found$']}}, None),
+        ('regex+max-body', {'filters': {'regex': ['^not found$']}}, args.max_body)
+    )
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            wordlist = os.path.join(tmp, 'words.txt')
+            write_wordlist(wordlist, args.words, 0)
+
+            for name, filter_kwargs, max_body in scenarios:
+                fuzzer_kwargs = {
+                    'url': f'http://127.0.0.1:{port}/FUZZ',
+                    'wordlists': {'FUZZ': wordlist},
+                    'threads': args.threads,
+                    'timeout': 30,
+                    'engine': args.engine,
+                    'max_body': max_body
+                }
+                stats = measure(ctx, fuzzer_kwargs, {'response_filter': ResponseFilter(**filter_kwargs)})
+                stats.update({'scenario': name, 'body_size': args.body_size})
+                rows.append(stats)
+                if not args.json:
+                    print(f"[+] {name:<15} requests={stats['requests']:<6} RPS={stats['rps']:<9.1f} "
+                          f"CPU/req={stats['cpu_per_request_us']:.0f}us max RSS={stats['max_rss_mb']:.1f}MB")
+    finally:
+        server.terminate()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def bench_throttle(args, ctx):
+    """So sánh -t cố định, --rate và --adaptive với server giới hạn capacity req/s (429 khi vượt)"""
+    scenarios = (
+        ('fixed', {}, 0),
+        ('rate', {'rate': args.capacity * 0.9}, 0),
+        ('adaptive', {'adaptive': True}, 0),
+        ('adaptive+retry-after', {'adaptive': True}, 1)
+    )
+    expected_hits = len(range(0, args.words, args.hit_every))
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        wordlist = os.path.join(tmp, 'words.txt')
+        output = os.path.join(tmp, 'results.jsonl')
+        write_wordlist(wordlist, args.words, args.hit_every)
+
+        for name, rate_kwargs, retry_after in scenarios:
+            options = {'latency': args.latency, 'body_size': 64, 'capacity': args.capacity, 'retry_after': retry_after}
+            server, port = start_server(ctx, options)
+            try:
+                fuzzer_kwargs = dict({
+                    'url': f'http://127.0.0.1:{port}/FUZZ',
+                    'wordlists': {'FUZZ': wordlist},
+                    'threads': args.threads,
+                    'timeout': 30,
+                    'engine': args.engine,
+                    'output_file': output
+                }, **rate_kwargs)
+                # Ghi cả 200 và 429 ra output để đếm hit tìm được và request bị throttle
+                response_filter = ResponseFilter(matchers={'codes': '200,429'})
+                stats = measure(ctx, fuzzer_kwargs, {'response_filter': response_filter})
+            finally:
+                server.terminate()
+
+            with open(output) as f:
+                statuses = [json.loads(line)['status_code'] for line in f]
+            stats.update({
+                'scenario': name,
+                'capacity': args.capacity,
+                'hits': statuses.count(200),
+                'expected_hits': expected_hits,
+                'throttled': statuses.count(429)
+            })
+            rows.append(stats)
+            if not args.json:
+                print(f"[+] {name:<21} elapsed={stats['elapsed']:<6.1f}s RPS={stats['rps']:<7.1f} "
+                      f"429={stats['throttled']:<6} hits={stats['hits']}/{expected_hits}")
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def bench_outliers(args, ctx):
+    """So sánh batching futures.pop(0) cũ với hàng đợi + worker sống lâu khi server có request chậm bất thường"""
+    options = {'latency': args.latency, 'body_size': 64, 'outlier_every': args.outlier_every,
+               'outlier_latency': args.outlier_latency}
+    server, port = start_server(ctx, options)
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            wordlist = os.path.join(tmp, 'words.txt')
+            write_wordlist(wordlist, args.words, 0)
+
+            for name, fuzzer_class in (('futures', 'LegacyBatchingFuzzer'), ('queue', 'BusyFuzzer')):
+                fuzzer_kwargs = {
+                    'url': f'http://127.0.0.1:{port}/FUZZ',
+                    'wordlists': {'FUZZ': wordlist},
+                    'threads': args.threads,
+                    'timeout': 30
+                }
+                stats = measure(ctx, fuzzer_kwargs, {'response_filter': ResponseFilter(filters={'codes': '404'})},
+                                fuzzer_class)
+                stats.update({'scheme': name, 'threads': args.threads})
+                rows.append(stats)
+                if not args.json:
+                    print(f"[+] {name:<8} requests={stats['requests']:<6} RPS={stats['rps']:<8.1f} "
+                          f"utilization={stats['utilization'] * 100:.1f}%")
+    finally:
+        server.terminate()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def legacy_startup(wordlists, cache_dir):
+    """Cách cũ: đếm dòng một lần rồi list() toàn bộ từng wordlist trước khi chạy itertools.product"""
+    total = 1
+    for wordlist_file in wordlists.values():
+        with open(wordlist_file, 'r', encoding='utf-8', errors='ignore') as f:
+            total *= sum(1 for line in f if line.strip())
+    generators = []
+    for wordlist_file in wordlists.values():
+        with open(wordlist_file, 'r', encoding='utf-8', errors='ignore') as f:
+            generators.append([line.strip() for line in f if line.strip()])
+    next(itertools.product(*generators))
+    return total
+
+
+def lazy_startup(wordlists, cache_dir):
+    """Engine lười: quét byte-level (hoặc đọc cache index), chỉ giữ wordlist ngoài trong RAM"""
+    fuzzer = MiniFFUF('http://127.0.0.1/', wordlists, index_cache_dir=cache_dir)
+    total = fuzzer.calculate_total_requests()
+    next(fuzzer.generate_combinations())
+    return total
+
+
+def run_startup(label, loader_name, wordlists, cache_dir, results):
+    """Đo thời gian tới combination đầu tiên và RSS tối đa trong process riêng"""
+    sys.stdout = open(os.devnull, 'w')
+    loader = globals()[loader_name]
+    start = time.perf_counter()
+    total = loader(wordlists, cache_dir)
+    results.put({
+        'loader': label,
+        'total': total,
+        'startup_s': time.perf_counter() - start,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    })
+
+
+def bench_wordlist(args, ctx):
+    """So sánh thời gian khởi động và bộ nhớ khi load wordlist lớn (vd. 10M dòng)"""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        big = os.path.join(tmp, 'passwords.txt')
+        small = os.path.join(tmp, 'users.txt')
+        write_wordlist(big, args.lines, 0)
+        write_wordlist(small, args.outer_lines, 0)
+        wordlists = {'USER': small, 'PASS': big}
+        cache_dir = os.path.join(tmp, 'index-cache')
+
+        # Lần chạy lazy thứ hai đọc index từ cache do lần đầu ghi ra
+        for label, loader_name in (('legacy', 'legacy_startup'), ('lazy', 'lazy_startup'),
+                                   ('lazy (cached)', 'lazy_startup')):
+            results = ctx.Queue()
+            process = ctx.Process(target=run_startup, args=(label, loader_name, wordlists, cache_dir, results))
+            process.start()
+            stats = results.get()
+            process.join()
+            rows.append(stats)
+            if not args.json:
+                print(f"[+] {label:<15} combinations={stats['total']:<12} "
+                      f"startup={stats['startup_s']:.2f}s max RSS={stats['max_rss_mb']:.1f}MB")
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def legacy_prepare(session, method, url, headers, data, replacements):
+    """Cách cũ: str.replace từng placeholder trên URL/headers/data rồi requests.Request + session.prepare_request"""
+    def replace_placeholders(text):
+        for placeholder, value in replacements.items():
+            text = text.replace(placeholder, value)
+        return text
+
+    target_url = replace_placeholders(url)
+    req_headers = {replace_placeholders(key): replace_placeholders(value) for key, value in headers.items()}
+    req = requests.Request(method=method, url=target_url, headers=req_headers, data=replace_placeholders(data))
+    prepared = session.prepare_request(req)
+    prepared.url = target_url
+    return prepared
+
+
+def bench_prepare(args, ctx):
+    """Đo chi phí chuẩn bị mỗi request: str.replace + prepare_request so với template biên dịch sẵn"""
+    server, port = start_server(ctx, {'latency': 0, 'body_size': 64})
+    placeholders = [f'P{i}' for i in range(args.placeholders)]
+    url = f'http://127.0.0.1:{port}/' + '/'.join(placeholders[:2]) + '?q=P0'
+    headers = {f'X-Header-{i}': f'value-{i}' for i in range(args.headers)}
+    headers['Cookie'] = 'session=P1'
+    headers['X-Forwarded-For'] = 'P0'
+    data = '&'.join(f'{p.lower()}={p}' for p in placeholders)
+
+    fuzzer = MiniFFUF(url, {p: os.devnull for p in placeholders})
+    template = fuzzer.compile_request('POST', headers, data)
+    combos = [{p: f'{p.lower()}-{i}' for p in placeholders} for i in range(args.requests)]
+
+    variants = {
+        'legacy': lambda r: legacy_prepare(fuzzer.session, 'POST', url, headers, data, r),
+        'template': lambda r: fuzzer.prepare_request(template, r)
+    }
+    rows = []
+    try:
+        for name, prepare in variants.items():
+            prepare_ns = 0
+            start = time.perf_counter()
+            for replacements in combos:
+                t0 = time.perf_counter_ns()
+                prepared = prepare(replacements)
+                prepare_ns += time.perf_counter_ns() - t0
+                fuzzer.session.send(prepared, timeout=10, allow_redirects=False).content
+            elapsed = time.perf_counter() - start
+            stats = {
+                'variant': name,
+                'requests': len(combos),
+                'prepare_us': prepare_ns / len(combos) / 1000,
+                'rps': len(combos) / elapsed
+            }
+            rows.append(stats)
+            if not args.json:
+                print(f"[+] {name:<9} prepare={stats['prepare_us']:.1f}us/request RPS={stats['rps']:.1f} "
+                      f"({args.placeholders} placeholders, {len(headers)} headers)")
+    finally:
+        server.terminate()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def bench_http2(args, ctx):
+    """So sánh số connection và RPS giữa HTTP/1.1 (engine thread, async) và --http2 trên server h2c giả lập"""
+    options = {'latency': args.latency, 'body_size': args.body_size}
+    http1_server, http1_port = start_server(ctx, options)
+    http2_server, http2_port = start_server(ctx, dict(options, http2=True, max_streams=args.server_streams))
+    scenarios = [('http/1.1 thread', http1_port, {'engine': 'thread'})]
+    if aiohttp is not None:
+        scenarios.append(('http/1.1 async', http1_port, {'engine': 'async'}))
+    scenarios.append(('http/2', http2_port, {'engine': 'async', 'http2': True, 'http2_streams': args.streams}))
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            wordlist = os.path.join(tmp, 'words.txt')
+            write_wordlist(wordlist, args.words, args.hit_every)
+
+            for name, port, transport_kwargs in scenarios:
+                fuzzer_kwargs = dict({
+                    'url': f'http://127.0.0.1:{port}/FUZZ',
+                    'wordlists': {'FUZZ': wordlist},
+                    'threads': args.concurrency,
+                    'timeout': 30
+                }, **transport_kwargs)
+                stats = measure(ctx, fuzzer_kwargs, {'response_filter': ResponseFilter(filters={'codes': '404'})})
+                stats.update({'transport': name, 'concurrency': args.concurrency})
+                rows.append(stats)
+                if not args.json:
+                    print(f"[+] {name:<16} requests={stats['requests']:<7} connections={stats['connections']:<5} "
+                          f"RPS={stats['rps']:<9.1f} CPU/req={stats['cpu_per_request_us']:.0f}us")
+    finally:
+        http1_server.terminate()
+        http2_server.terminate()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def bench_raw(args, ctx):
+    """So sánh make_request (requests), engine async và engine raw (có/không pipeline) trên loopback"""
+    server, port = start_server(ctx, {'latency': args.latency, 'body_size': args.body_size,
+                                      'close_every': args.close_every})
+    expected_hits = len(range(0, args.words, args.hit_every)) if args.hit_every else 0
+    lost = False
+    scenarios = [('thread', {'engine': 'thread'})]
+    if aiohttp is not None:
+        scenarios.append(('async', {'engine': 'async'}))
+    scenarios += [(f"raw pipeline={pipeline}", {'engine': 'raw', 'pipeline': pipeline}) for pipeline in args.pipeline]
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            wordlist = os.path.join(tmp, 'words.txt')
+            write_wordlist(wordlist, args.words, args.hit_every)
+
+            for name, engine_kwargs in scenarios:
+                fuzzer_kwargs = dict({
+                    'url': f'http://127.0.0.1:{port}/FUZZ',
+                    'wordlists': {'FUZZ': wordlist},
+                    'threads': args.concurrency,
+                    'timeout': 30
+                }, **engine_kwargs)
+                stats = measure(ctx, fuzzer_kwargs, {'response_filter': ResponseFilter(filters={'codes': '404'})})
+                stats.update({'scenario': name, 'concurrency': args.concurrency})
+                rows.append(stats)
+                if not args.json:
+                    print(f"[+] {name:<18} requests={stats['requests']:<7} RPS={stats['rps']:<9.1f} "
+                          f"CPU/req={stats['cpu_per_request_us']:.0f}us connections={stats['connections']}")
+                # Mọi combination phải có response thật: lỗi status 0 cũng lọt qua -fc 404 thành kết quả giả
+                if stats['failed'] or stats['results'] != expected_hits:
+                    print(f"[!] {name}: failed={stats['failed']} results={stats['results']} "
+                          f"(cần failed=0 results={expected_hits})", file=sys.stderr)
+                    lost = True
+    finally:
+        server.terminate()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    if lost:
+        sys.exit(1)
+
+
+SUITE_SCENARIOS = ('single', 'product', 'regex', 'skip-after')
+
+
+def suite_scenario(name, port, tmp, args):
+    """fuzzer_kwargs và run_kwargs của một scenario trong suite, các wordlist tạo trong thư mục tmp"""
+    base = f'http://127.0.0.1:{port}'
+    words = os.path.join(tmp, 'words.txt')
+    if not os.path.exists(words):
+        write_wordlist(words, args.words, args.hit_every)
+    run_kwargs = {'response_filter': ResponseFilter(filters={'codes': '404'})}
+    if name == 'single':
+        fuzzer_kwargs = {'url': f'{base}/FUZZ', 'wordlists': {'FUZZ': words}}
+    elif name == 'product':
+        # DIR x EXT: cùng số combination với single nhưng sinh qua tích của hai wordlist
+        dirs = os.path.join(tmp, 'dirs.txt')
+        exts = os.path.join(tmp, 'exts.txt')
+        write_wordlist(dirs, max(1, args.words // 10), max(1, args.hit_every // 10))
+        write_wordlist(exts, 10, 0)
+        fuzzer_kwargs = {'url': f'{base}/DIR.EXT', 'wordlists': {'DIR': dirs, 'EXT': exts}}
+    elif name == 'regex':
+        # Filter theo nội dung: mọi body phải được giữ lại và decode để chạy regex
+        fuzzer_kwargs = {'url': f'{base}/FUZZ', 'wordlists': {'FUZZ': words}}
+        run_kwargs = {'response_filter': ResponseFilter(filters={'regex': [r'not\s+found']})}
+    else:
+        # Mỗi user admin trả 200 với mọi password: --skip-after bỏ các password còn lại của user đó
+        users = os.path.join(tmp, 'users.txt')
+        passwords = os.path.join(tmp, 'passwords.txt')
+        write_wordlist(users, max(1, args.words // 100), 2)
+        write_wordlist(passwords, 100, 0)
+        fuzzer_kwargs = {'url': f'{base}/login?user=USER&pass=PASS', 'wordlists': {'USER': users, 'PASS': passwords},
+                         'skip_after_placeholder': 'USER'}
+    fuzzer_kwargs.update({
+        'threads': args.concurrency,
+        'timeout': 30,
+        'engine': args.engine,
+        'retries': args.retries,
+        # Server wildcard trả 200 cho mọi path: cần -ac để còn phân biệt được hit
+        'auto_calibrate': args.wildcard
+    })
+    return fuzzer_kwargs, run_kwargs
+
+
+def git_revision():
+    """Commit hiện tại của repo (để so sánh kết quả giữa các lần chạy), None nếu không lấy được"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def bench_suite(args, ctx):
+    """Chạy các scenario chuẩn với server giả lập có latency/lỗi/429/wildcard, in số liệu để theo dõi regression"""
+    options = {
+        'latency': args.latency,
+        'latency_dist': args.latency_dist,
+        'body_size': args.body_size,
+        'error_rate': args.error_rate,
+        'reset_rate': args.reset_rate,
+        'throttle_rate': args.throttle_rate,
+        'wildcard': args.wildcard,
+        'pages': True
+    }
+    server, port = start_server(ctx, options)
+    # Thông tin chung của lần chạy, gắn vào mỗi dòng kết quả
+    run_info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': args.engine,
+        'concurrency': args.concurrency,
+        'server': {key: value for key, value in options.items() if key != 'pages'}
+    }
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in args.scenarios:
+                fuzzer_kwargs, run_kwargs = suite_scenario(name, port, tmp, args)
+                stats = measure(ctx, fuzzer_kwargs, run_kwargs)
+                stats.update(run_info, scenario=name)
+                rows.append(stats)
+                if not args.json:
+                    print(f"[+] {name:<11} requests={stats['requests']:<7} RPS={stats['rps']:<9.1f} "
+                          f"CPU/req={stats['cpu_per_request_us']:.0f}us max RSS={stats['max_rss_mb']:.1f}MB "
+                          f"p50={stats.get('p50_ms', 0):.1f}ms p99={stats.get('p99_ms', 0):.1f}ms "
+                          f"results={stats['results']} failed={stats['failed']}")
+    finally:
+        server.terminate()
+
+    if args.output:
+        # JSONL ghi nối: mỗi lần chạy thêm một dòng cho mỗi scenario, dễ vẽ theo thời gian
+        with open(args.output, 'a') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def parse_scenarios(value):
+    """Parse danh sách scenario của suite phân cách bằng dấu phẩy"""
+    scenarios = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = [name for name in scenarios if name not in SUITE_SCENARIOS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"scenario không hợp lệ: {', '.join(unknown)} (chọn trong {', '.join(SUITE_SCENARIOS)})")
+    return scenarios
+
+
+def parse_int_list(value):
+    """Parse danh sách số nguyên phân cách bằng dấu phẩy"""
+    return [int(item.strip()) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mini FFUF benchmark với server giả lập local')
+    subparsers = parser.add_subparsers(dest='scenario', required=True)
+
+    engines = subparsers.add_parser('engines', help='So sánh engine thread và async')
+    engines.add_argument('--words', type=int, default=20000, help='Số từ trong wordlist (default: 20000)')
+    engines.add_argument('--concurrency', type=parse_int_list, default=[50, 500],
+                         help='Các mức -t cần đo (default: 50,500)')
+    engines.add_argument('--latency', type=float, default=0.01, help='Độ trễ server mỗi request (giây, default: 0.01)')
+    engines.add_argument('--body-size', type=int, default=1024, help='Kích thước response body (default: 1024)')
+    engines.add_argument('--hit-every', type=int, default=1000, help='Cứ N từ có một từ trả về 200 (default: 1000)')
+    engines.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    wordlist = subparsers.add_parser('wordlist', help='Đo thời gian khởi động và bộ nhớ với wordlist lớn')
+    wordlist.add_argument('--lines', type=int, default=10000000, help='Số dòng của wordlist lớn (default: 10000000)')
+    wordlist.add_argument('--outer-lines', type=int, default=100, help='Số dòng của wordlist nhỏ (default: 100)')
+    wordlist.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    prepare = subparsers.add_parser('prepare', help='Đo chi phí chuẩn bị mỗi request (template vs str.replace)')
+    prepare.add_argument('--requests', type=int, default=5000, help='Số request (default: 5000)')
+    prepare.add_argument('--placeholders', type=int, default=4, help='Số placeholder (default: 4)')
+    prepare.add_argument('--headers', type=int, default=8, help='Số header tĩnh (default: 8)')
+    prepare.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    body = subparsers.add_parser('body', help='Đo chi phí đọc body lớn theo loại filter')
+    body.add_argument('--words', type=int, default=2000, help='Số từ trong wordlist (default: 2000)')
+    body.add_argument('--threads', type=int, default=20, help='Số threads/request đồng thời (default: 20)')
+    body.add_argument('--engine', choices=ENGINES, default='thread', help='Engine cần đo (default: thread)')
+    body.add_argument('--body-size', type=int, default=1 << 20, help='Kích thước response body (default: 1MB)')
+    body.add_argument('--max-body', type=int, default=4096, help='Giới hạn --max-body cho scenario cuối (default: 4096)')
+    body.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    throttle = subparsers.add_parser('throttle', help='Đo --rate/--adaptive với server giới hạn req/s')
+    throttle.add_argument('--words', type=int, default=3000, help='Số từ trong wordlist (default: 3000)')
+    throttle.add_argument('--capacity', type=float, default=200, help='Số req/s server chịu được (default: 200)')
+    throttle.add_argument('--threads', type=int, default=50, help='-t của fuzzer (default: 50)')
+    throttle.add_argument('--engine', choices=ENGINES, default='thread', help='Engine cần đo (default: thread)')
+    throttle.add_argument('--latency', type=float, default=0.01, help='Độ trễ server mỗi request (giây, default: 0.01)')
+    throttle.add_argument('--hit-every', type=int, default=50, help='Cứ N từ có một từ trả về 200 (default: 50)')
+    throttle.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    outliers = subparsers.add_parser('outliers', help='Đo head-of-line blocking khi có request chậm bất thường')
+    outliers.add_argument('--words', type=int, default=5000, help='Số từ trong wordlist (default: 5000)')
+    outliers.add_argument('--threads', type=int, default=20, help='-t của fuzzer (default: 20)')
+    outliers.add_argument('--latency', type=float, default=0.005, help='Độ trễ server thông thường (giây, default: 0.005)')
+    outliers.add_argument('--outlier-every', type=int, default=100, help='Cứ N request có một request chậm (default: 100)')
+    outliers.add_argument('--outlier-latency', type=float, default=1.0, help='Độ trễ của request chậm (giây, default: 1)')
+    outliers.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    http2 = subparsers.add_parser('http2', help='So sánh HTTP/1.1 và --http2 (số connection, RPS)')
+    http2.add_argument('--words', type=int, default=20000, help='Số từ trong wordlist (default: 20000)')
+    http2.add_argument('--concurrency', type=int, default=200, help='-t của fuzzer (default: 200)')
+    http2.add_argument('--streams', type=int, default=100, help='--http2-streams của fuzzer (default: 100)')
+    http2.add_argument('--server-streams', type=int, default=100,
+                       help='MAX_CONCURRENT_STREAMS của server h2 (default: 100)')
+    http2.add_argument('--latency', type=float, default=0.01, help='Độ trễ server mỗi request (giây, default: 0.01)')
+    http2.add_argument('--body-size', type=int, default=1024, help='Kích thước response body (default: 1024)')
+    http2.add_argument('--hit-every', type=int, default=1000, help='Cứ N từ có một từ trả về 200 (default: 1000)')
+    http2.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    raw = subparsers.add_parser('raw', help='So sánh make_request, engine async và engine raw trên loopback')
+    raw.add_argument('--words', type=int, default=50000, help='Số từ trong wordlist (default: 50000)')
+    raw.add_argument('--concurrency', type=int, default=50, help='-t của fuzzer (default: 50)')
+    raw.add_argument('--pipeline', type=parse_int_list, default=[1, 8],
+                     help='Các mức --pipeline của engine raw cần đo (default: 1,8)')
+    raw.add_argument('--latency', type=float, default=0, help='Độ trễ server mỗi request (giây, default: 0)')
+    raw.add_argument('--body-size', type=int, default=1024, help='Kích thước response body (default: 1024)')
+    raw.add_argument('--hit-every', type=int, default=1000, help='Cứ N từ có một từ trả về 200 (default: 1000)')
+    raw.add_argument('--close-every', type=int, default=0,
+                     help='Server gửi Connection: close sau mỗi N response trên một connection (default: 0)')
+    raw.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    suite = subparsers.add_parser('suite', help='Chạy các scenario chuẩn, in RPS/CPU/RSS/latency để theo dõi regression')
+    suite.add_argument('--scenarios', type=parse_scenarios, default=list(SUITE_SCENARIOS),
+                       help=f"Các scenario cần chạy (default: {','.join(SUITE_SCENARIOS)})")
+    suite.add_argument('--words', type=int, default=20000, help='Số combination mỗi scenario (default: 20000)')
+    suite.add_argument('--engine', choices=ENGINES, default='thread', help='Engine cần đo (default: thread)')
+    suite.add_argument('--concurrency', type=int, default=50, help='-t của fuzzer (default: 50)')
+    suite.add_argument('--retries', type=int, default=0, help='--retries của fuzzer (default: 0)')
+    suite.add_argument('--latency', type=float, default=0.005, help='Độ trễ trung bình của server (giây, default: 0.005)')
+    suite.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS, default='fixed',
+                       help='Phân phối độ trễ của server (default: fixed)')
+    suite.add_argument('--body-size', type=int, default=1024, help='Kích thước response body (default: 1024)')
+    suite.add_argument('--error-rate', type=float, default=0, help='Tỉ lệ response 500 (default: 0)')
+    suite.add_argument('--reset-rate', type=float, default=0, help='Tỉ lệ connection bị đóng thay vì trả lời (default: 0)')
+    suite.add_argument('--throttle-rate', type=float, default=0, help='Tỉ lệ response 429 ngẫu nhiên (default: 0)')
+    suite.add_argument('--wildcard', action='store_true',
+                       help='Server trả 200 với trang soft-404 phản chiếu path cho mọi path (fuzzer chạy với -ac)')
+    suite.add_argument('--hit-every', type=int, default=1000, help='Cứ N từ có một từ trả về 200 (default: 1000)')
+    suite.add_argument('--output', help='Ghi nối kết quả (JSONL) vào file để so sánh giữa các lần chạy')
+    suite.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    args = parser.parse_args()
+
+    # spawn để mỗi lần đo có bộ nhớ sạch, không kế thừa từ process cha
+    ctx = multiprocessing.get_context('spawn')
+    if args.scenario == 'engines':
+        bench_engines(args, ctx)
+    elif args.scenario == 'wordlist':
+        bench_wordlist(args, ctx)
+    elif args.scenario == 'prepare':
+        bench_prepare(args, ctx)
+    elif args.scenario == 'body':
+        bench_body(args, ctx)
+    elif args.scenario == 'throttle':
+        bench_throttle(args, ctx)
+    elif args.scenario == 'outliers':
+        bench_outliers(args, ctx)
+    elif args.scenario == 'raw':
+        bench_raw(args, ctx)
+    elif args.scenario == 'suite':
+        bench_suite(args, ctx)
+    elif args.scenario == 'http2':
+        if h2 is None:
+            parser.error('scenario http2 cần thư viện h2 (pip install h2)')
+        bench_http2(args, ctx)
+
+
+if __name__ == '__main__':
+    main()